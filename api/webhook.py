@@ -21,6 +21,9 @@ if not TOKEN:
 bot = Bot(token=TOKEN, default=DefaultBotProperties(parse_mode="HTML"))
 dp = Dispatcher(bot, storage=MemoryStorage())
 
+# Обработчики вебхука к БД не обращаются: на Vercel файловая система эфемерна,
+# и users.db пропадал бы при каждом холодном старте
+
 # --- Пример ваших функций и обработчиков ---
 # Вместо "..." подставьте свою логику, обработчики, работу с БД и т.п.
 
@@ -1,11 +1,16 @@
 import os
+import asyncio
+import contextlib
 import datetime
+import functools
 import logging
-import sqlite3
 import random
 from typing import Optional
 
-from aiogram import Bot, Dispatcher, types
+import aiosqlite
+
+from aiogram import Bot, Dispatcher, F, types
+from aiogram.exceptions import TelegramRetryAfter
 from aiogram.filters import Command
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton
 from aiogram.client.bot import DefaultBotProperties
@@ -21,11 +26,14 @@ from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_applicati
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 
-from flask import Flask, request, Response
-
 # ================== Глобальные настройки ==================
 TARGET_YEARS_DISPLAY = 90
 WEEKS_IN_YEAR = 52
+# Рассылка недельных отчётов: воркеры перекрывают сетевые задержки,
+# а общий темп держится ниже лимита Telegram (~30 сообщений/с)
+BROADCAST_WORKERS = 10
+BROADCAST_RATE = 25  # сообщений в секунду на всю рассылку
+BROADCAST_RETRIES = 3  # попыток на пользователя при 429 Too Many Requests
 
 logging.basicConfig(
     level=logging.INFO,
@@ -54,90 +62,264 @@ else:
         logger.critical("ADMIN_ID должен быть числом!")
         exit(1)
 
+# Собственный генератор для выбора случайных фраз
+_rng = random.Random()
+
 bot = Bot(token=TOKEN, default=DefaultBotProperties(parse_mode="HTML"))
 dp = Dispatcher(storage=MemoryStorage())
 scheduler = AsyncIOScheduler()
 
 
 # ================== База данных (SQLite) ==================
-def create_database():
-    """Создаёт таблицы users и messages, если их нет."""
+DB_PATH = "users.db"
+
+# WAL: чтения не блокируются записью; busy_timeout — ждать, а не падать с SQLITE_BUSY
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-20000",
+)
+
+
+class ConnectionPool:
+    """Пул долгоживущих aiosqlite-соединений поверх asyncio.Queue."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=size)
+        self._connections: list[aiosqlite.Connection] = []
+
+    def add(self, conn: aiosqlite.Connection):
+        self._connections.append(conn)
+        self._queue.put_nowait(conn)
+
+    @contextlib.asynccontextmanager
+    async def acquire(self):
+        """Берёт соединение из пула и возвращает его обратно после использования."""
+        # Без открытых соединений get() ждал бы вечно
+        if not self._connections:
+            raise RuntimeError("Пул соединений с БД не открыт")
+        conn = await self._queue.get()
+        try:
+            yield conn
+        finally:
+            self._queue.put_nowait(conn)
+
+    async def close(self):
+        for conn in self._connections:
+            await conn.close()
+        self._connections.clear()
+        while not self._queue.empty():
+            self._queue.get_nowait()
+
+
+# Единственный писатель (INSERT/UPSERT) и читатели по числу ядер (SELECT)
+writer_pool = ConnectionPool(1)
+reader_pool = ConnectionPool(os.cpu_count() or 1)
+
+
+async def open_connection(database: str, **kwargs) -> aiosqlite.Connection:
+    """Открывает соединение в режиме autocommit и применяет к нему SQLITE_PRAGMAS.
+
+    Транзакции записи открываются явно (BEGIN IMMEDIATE), а writer_pool
+    с единственным соединением служит замком на запись; чтения в WAL не блокируются.
+    """
+    conn = await aiosqlite.connect(database, isolation_level=None, **kwargs)
+    if ':memory:' not in database:
+        for pragma in SQLITE_PRAGMAS:
+            await conn.execute(pragma)
+    return conn
+
+
+async def create_database():
+    """Создаёт таблицы users и messages, если их нет, и открывает пулы соединений."""
     try:
-        with sqlite3.connect('users.db') as conn:
-            cursor = conn.cursor()
-            # Таблица пользователей
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS users (
-                    user_id INTEGER PRIMARY KEY,
-                    birth_date TEXT
-                )
-            ''')
-            # Таблица сообщений
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS messages (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER,
-                    text TEXT,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            conn.commit()
+        db = await open_connection(DB_PATH)
+        writer_pool.add(db)
+        # Таблица пользователей
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS users (
+                user_id INTEGER PRIMARY KEY,
+                birth_date TEXT
+            )
+        ''')
+        # Таблица сообщений
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER,
+                text TEXT,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        # Индекс для GROUP BY user_id в /superstats
+        await db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_messages_user_id ON messages(user_id)")
+        await db.commit()
+
+        # Читатели открываются только после того, как файл БД создан писателем
+        for _ in range(reader_pool.size):
+            reader_pool.add(await open_connection(f"file:{DB_PATH}?mode=ro",
+                                                  uri=True))
     except Exception as e:
         logger.error(f"Ошибка при создании базы данных: {e}")
+        await close_database()
+        raise
+
+
+@contextlib.asynccontextmanager
+async def write_transaction():
+    """Берёт соединение-писатель и оборачивает блок в BEGIN IMMEDIATE ... COMMIT."""
+    async with writer_pool.acquire() as db:
+        try:
+            await db.execute("BEGIN IMMEDIATE")
+            yield db
+            await db.commit()
+        except BaseException:
+            # В т.ч. при отмене задачи: писатель не должен вернуться в пул
+            # с открытой транзакцией. Вне транзакции rollback ничего не делает
+            await db.rollback()
+            raise
+
+
+async def close_database():
+    """Закрывает все соединения с БД."""
+    await writer_pool.close()
+    await reader_pool.close()
+
 
+# Кеш user_id -> birth_date: заполняется при save_user и при первом get_user
+_user_cache: dict[int, str] = {}
 
-def save_user(user_id: int, birth_date: str):
+
+async def save_user(user_id: int, birth_date: str):
     """Сохраняет (или обновляет) запись о пользователе (user_id, birth_date)."""
+    # Старое значение больше не актуально, даже если запись не удастся
+    _user_cache.pop(user_id, None)
     try:
-        with sqlite3.connect('users.db') as conn:
-            cursor = conn.cursor()
-            cursor.execute(
+        async with write_transaction() as db:
+            await db.execute(
                 '''
-                INSERT OR REPLACE INTO users (user_id, birth_date)
+                INSERT INTO users (user_id, birth_date)
                 VALUES (?, ?)
+                ON CONFLICT(user_id) DO UPDATE SET birth_date = excluded.birth_date
             ''', (user_id, birth_date))
-            conn.commit()
+        _user_cache[user_id] = birth_date
     except Exception as e:
         logger.error(f"Ошибка при сохранении пользователя {user_id}: {e}")
 
 
-def get_user(user_id: int) -> Optional[str]:
+async def get_user(user_id: int) -> Optional[str]:
     """Возвращает birth_date (str) или None, если юзер не найден."""
+    birth_date = _user_cache.get(user_id)
+    if birth_date is not None:
+        return birth_date
     try:
-        with sqlite3.connect('users.db') as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT birth_date FROM users WHERE user_id = ?",
-                           (user_id, ))
-            row = cursor.fetchone()
-            return row[0] if row else None
+        async with reader_pool.acquire() as db:
+            async with db.execute(
+                    "SELECT birth_date FROM users WHERE user_id = ?",
+                    (user_id, )) as cursor:
+                row = await cursor.fetchone()
+        if not row:
+            return None
+        # Пока ждали читателя, save_user мог записать более свежую дату — не затираем её
+        return _user_cache.setdefault(user_id, row[0])
     except Exception as e:
         logger.error(f"Ошибка при получении пользователя {user_id}: {e}")
         return None
 
 
-def get_all_users():
+async def get_all_users():
     """Возвращает список (user_id, birth_date) для всех записей."""
     try:
-        with sqlite3.connect('users.db') as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT user_id, birth_date FROM users")
-            return cursor.fetchall()
+        async with reader_pool.acquire() as db:
+            async with db.execute(
+                    "SELECT user_id, birth_date FROM users") as cursor:
+                return await cursor.fetchall()
     except Exception as e:
         logger.error(f"Ошибка при получении всех пользователей: {e}")
         return []
 
 
+# Входящие сообщения копятся в очереди и пишутся в БД пачками
+LOG_QUEUE_SIZE = 10_000
+LOG_BATCH_SIZE = 500
+LOG_FLUSH_INTERVAL = 5  # секунд
+
+log_queue: asyncio.Queue = asyncio.Queue(maxsize=LOG_QUEUE_SIZE)
+log_flusher_task: Optional[asyncio.Task] = None
+
+
 def log_user_message(user_id: int, text: str):
-    """Записывает входящее сообщение пользователя в таблицу messages."""
+    """Ставит входящее сообщение пользователя в очередь на запись в messages."""
+    timestamp = datetime.datetime.now(
+        datetime.timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    try:
+        log_queue.put_nowait((user_id, text, timestamp))
+    except asyncio.QueueFull:
+        logger.warning(f"Очередь сообщений переполнена, сообщение {user_id} потеряно")
+
+
+async def write_messages(batch: list):
+    """Записывает пачку (user_id, text, timestamp) одной транзакцией."""
     try:
-        with sqlite3.connect("users.db") as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                "INSERT INTO messages (user_id, text) VALUES (?, ?)",
-                (user_id, text))
-            conn.commit()
-    except sqlite3.Error as e:
-        logger.error(f"Ошибка при записи сообщения: {e}")
+        async with write_transaction() as db:
+            await db.executemany(
+                "INSERT INTO messages (user_id, text, timestamp) VALUES (?, ?, ?)",
+                batch)
+    except Exception as e:
+        # Любая ошибка гасится здесь, иначе она молча убьёт flush_messages_task
+        logger.error(f"Ошибка при записи {len(batch)} сообщений: {e}")
+
+
+async def flush_messages_task():
+    """Фоновая задача: сбрасывает очередь в БД пачками до LOG_BATCH_SIZE
+    сообщений, не реже чем раз в LOG_FLUSH_INTERVAL секунд."""
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = []
+        try:
+            batch.append(await log_queue.get())
+            deadline = loop.time() + LOG_FLUSH_INTERVAL
+            while len(batch) < LOG_BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(log_queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+        except asyncio.CancelledError:
+            # Уже вынутые из очереди сообщения не теряем
+            if batch:
+                await write_messages(batch)
+            raise
+
+        # Отмена прерывает только ожидание: начатая транзакция доводится до конца
+        write = asyncio.ensure_future(write_messages(batch))
+        try:
+            await asyncio.shield(write)
+        except asyncio.CancelledError:
+            await write
+            raise
+
+
+async def stop_log_flusher():
+    """Останавливает фоновую задачу и дописывает то, что осталось в очереди."""
+    global log_flusher_task
+    if log_flusher_task is not None:
+        log_flusher_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await log_flusher_task
+        log_flusher_task = None
+
+    batch = []
+    while not log_queue.empty():
+        batch.append(log_queue.get_nowait())
+    if batch:
+        await write_messages(batch)
 
 
 # ================== Состояния FSM ==================
@@ -194,6 +376,27 @@ class BotTexts:
         "Час за часом мы формируем будущее!"
     ]
 
+    MOTIVATIONS = [
+        "🌱 Каждый день — новый шанс изменить свою историю",
+        "⏳ Время не ждет, но ты можешь им управлять",
+        "💡 Сегодняшние усилия — завтрашние достижения",
+        "🚀 Маленькие шаги приводят к большим целям",
+        "🌌 Твоя жизнь — самый ценный проект",
+        "🔑 Ключ к будущему — в настоящих поступках",
+        "🔥 Не бойся идти вперёд, даже если шаги малы",
+        "✨ Великие дела начинаются с маленькой идеи",
+        "🌿 Расти, как растёт дерево: медленно, но уверенно",
+        "💎 Каждый прожитый день — бесценный опыт"
+    ]
+
+    # Саркастические ответы на непонятные сообщения ({name} подставляется при выборе)
+    FALLBACK_PHRASES = [
+        "Ты тратишь время, {name}, ведь я всего лишь бот — а жизнь твоя конечна.",
+        "{name}, неужели писать боту — лучшее, что ты можешь сделать?",
+        "Каждая секунда уходит безвозвратно, {name}, а ты здесь со мной...",
+        "Время идёт, {name}, и пока мы тут болтаем, никто не становится моложе."
+    ]
+
     WELCOME_RETURN = (
         "🌀 <b>{name}, твое путешествие продолжается!</b>\n"
         "📖 Начало пути: <b>{date}</b>\n"
@@ -201,67 +404,160 @@ class BotTexts:
         "⌛ Прожито недель: <b>{weeksLived}</b> из <b>{targetWeeks}</b>\n\n"
         "{random_line}")
 
-    WEEKLY_REPORT = (
-        "🌌 Недельный отчет | Цикл <b>{week_number}</b>\n"
-        "▰ Прожито недель: <b>{weeksLived}</b> из <b>{targetWeeks}</b> (<b>{progress:.1%}</b>)\n"
-        "🌖 Фаза Луны: {moon_phase}\n"
-        "{random_line}")
+    # Недельный отчёт: шапка и подвал общие для всей рассылки,
+    # строка прогресса собирается для каждого пользователя в send_weekly_update
+    WEEKLY_REPORT_HEADER = "🌌 Недельный отчет | Цикл <b>{week_number}</b>\n"
+    WEEKLY_REPORT_PROGRESS = (
+        "▰ Прожито недель: <b>{weeksLived}</b> из <b>{targetWeeks}</b> "
+        "(<b>{progress:.1%}</b>)\n")
+    WEEKLY_REPORT_FOOTER = "🌖 Фаза Луны: {moon_phase}\n{random_line}"
 
 
 # ================== Утилиты ==================
+@functools.lru_cache(maxsize=10000)
 def validate_date(date_str: str) -> Optional[datetime.date]:
+    """Разбирает ДД.ММ.ГГГГ без strptime; результат кешируется по исходной строке."""
     try:
-        return datetime.datetime.strptime(date_str, "%d.%m.%Y").date()
+        day, month, year = date_str.split('.')
+        if (len(day) > 2 or len(month) > 2 or len(year) != 4
+                or not (day + month + year).isascii()
+                or not (day + month + year).isdigit()):
+            return None
+        return datetime.date(int(year), int(month), int(day))
     except ValueError:
         return None
 
 
-def create_progress_bar(percentage: float, length: int = 10) -> str:
-    filled = '▰' * int(percentage * length)
-    empty = '▱' * (length - len(filled))
-    return f"{filled}{empty} {percentage:.1%}"
+# Все 11 возможных полосок для длины 10 (от пустой до полной)
+_BARS = tuple('▰' * i + '▱' * (10 - i) for i in range(11))
+
+
+def create_progress_bar(percentage: float) -> str:
+    filled = max(0, min(10, int(percentage * 10)))
+    return f"{_BARS[filled]} {percentage:.1%}"
+
+
+MOON_PHASES = (
+    "🌑 Новолуние - Начало пути", "🌒 Молодая луна - Время действий",
+    "🌓 Первая четверть - Испытание воли", "🌔 Прибывающая - Сбор плодов",
+    "🌕 Полнолуние - Пик возможностей", "🌖 Убывающая - Анализ итогов",
+    "🌗 Последняя четверть - Отпускание", "🌘 Старая луна - Подготовка"
+)
+
+
+@functools.lru_cache(maxsize=1)
+def _moon_phase_for(day_ordinal: int) -> str:
+    return MOON_PHASES[datetime.date.fromordinal(day_ordinal).day % 8]
 
 
 def get_moon_phase() -> str:
-    phases = [
-        "🌑 Новолуние - Начало пути", "🌒 Молодая луна - Время действий",
-        "🌓 Первая четверть - Испытание воли", "🌔 Прибывающая - Сбор плодов",
-        "🌕 Полнолуние - Пик возможностей", "🌖 Убывающая - Анализ итогов",
-        "🌗 Последняя четверть - Отпускание", "🌘 Старая луна - Подготовка"
-    ]
-    return phases[datetime.datetime.now().day % 8]
+    # maxsize=1: с новым днём старое значение вытесняется само
+    return _moon_phase_for(datetime.date.today().toordinal())
 
 
 # ================== Плановая задача ==================
-async def send_weekly_update(user_id: int, birth_date: str):
+class RateLimiter:
+    """Пропускает не больше rate вызовов wait() в секунду на всех вызывающих."""
+
+    def __init__(self, rate: float):
+        self._interval = 1 / rate
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            # Проверяем заново после каждого сна: pause() мог сдвинуть слот
+            while (delay := self._next_slot - loop.time()) > 0:
+                await asyncio.sleep(delay)
+            self._next_slot = max(loop.time(),
+                                  self._next_slot) + self._interval
+
+    def pause(self, seconds: float):
+        """Сдвигает следующий слот, например на retry_after из ответа Telegram."""
+        self._next_slot = max(self._next_slot,
+                              asyncio.get_running_loop().time() + seconds)
+
+
+broadcast_limiter = RateLimiter(BROADCAST_RATE)
+# Воркеры текущей рассылки (отменяются при остановке приложения)
+broadcast_workers: set[asyncio.Task] = set()
+
+
+async def send_weekly_update(user_id: int, birth_date_obj: datetime.date,
+                             today: datetime.date, targetWeeks: int,
+                             header: str, footer: str):
     """Отправляет недельный отчёт c фазой Луны."""
     try:
-        birth_date_obj = datetime.datetime.strptime(birth_date,
-                                                    "%d.%m.%Y").date()
-        weeksLived = (datetime.date.today() - birth_date_obj).days // 7
-        targetWeeks = TARGET_YEARS_DISPLAY * WEEKS_IN_YEAR
+        weeksLived = (today - birth_date_obj).days // 7
         progress = weeksLived / targetWeeks
-        week_number = datetime.date.today().isocalendar()[1]
-
-        random_line = random.choice(BotTexts.RANDOM_ENDING_PHRASES)
-        await bot.send_message(
-            user_id,
-            BotTexts.WEEKLY_REPORT.format(week_number=week_number,
-                                          weeksLived=weeksLived,
-                                          targetWeeks=targetWeeks,
-                                          progress=progress,
-                                          moon_phase=get_moon_phase(),
-                                          random_line=random_line))
+
+        text = header + BotTexts.WEEKLY_REPORT_PROGRESS.format(
+            weeksLived=weeksLived, targetWeeks=targetWeeks,
+            progress=progress) + footer
+
+        for attempt in range(1, BROADCAST_RETRIES + 1):
+            await broadcast_limiter.wait()
+            try:
+                await bot.send_message(user_id, text)
+                return
+            except TelegramRetryAfter as e:
+                # Притормаживаем всю рассылку, а не только этого воркера
+                broadcast_limiter.pause(e.retry_after)
+                logger.warning(
+                    f"Лимит Telegram при отправке отчета {user_id}, "
+                    f"повтор через {e.retry_after} с ({attempt}/{BROADCAST_RETRIES})")
+        logger.error(
+            f"Отчет пользователю {user_id} не отправлен: лимит Telegram")
     except Exception as e:
         logger.error(f"Ошибка отправки отчета пользователю {user_id}: {e}")
 
 
+async def broadcast_worker(queue: asyncio.Queue, today: datetime.date,
+                           targetWeeks: int, header: str, footer: str):
+    """Берёт пользователей из очереди и отправляет им отчёт, пока очередь не опустеет."""
+    while True:
+        try:
+            user_id, birth_date_obj = queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        await send_weekly_update(user_id, birth_date_obj, today, targetWeeks,
+                                 header, footer)
+
+
 async def weekly_updates_task():
     """Запускается каждую неделю (понедельник 9:00) и шлёт отчёт всем."""
     try:
-        users = get_all_users()
+        users = await get_all_users()
+
+        # Общие для всех пользователей значения считаем один раз
+        today = datetime.date.today()
+        targetWeeks = TARGET_YEARS_DISPLAY * WEEKS_IN_YEAR
+        header = BotTexts.WEEKLY_REPORT_HEADER.format(
+            week_number=today.isocalendar()[1])
+        footer = BotTexts.WEEKLY_REPORT_FOOTER.format(
+            moon_phase=get_moon_phase(),
+            random_line=_rng.choice(BotTexts.RANDOM_ENDING_PHRASES))
+
+        queue: asyncio.Queue = asyncio.Queue()
         for user_id, birth_date in users:
-            await send_weekly_update(user_id, birth_date)
+            birth_date_obj = validate_date(birth_date)
+            if not birth_date_obj:
+                logger.error(
+                    f"Некорректная дата рождения у пользователя {user_id}: {birth_date}")
+                continue
+            queue.put_nowait((user_id, birth_date_obj))
+
+        workers = [
+            asyncio.create_task(
+                broadcast_worker(queue, today, targetWeeks, header, footer))
+            for _ in range(min(BROADCAST_WORKERS, queue.qsize()))
+        ]
+        broadcast_workers.update(workers)
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            broadcast_workers.difference_update(workers)
     except Exception as e:
         logger.error(f"Ошибка задачи обновлений: {e}")
 
@@ -285,9 +581,10 @@ main_keyboard = ReplyKeyboardMarkup(
 async def start_handler(message: types.Message, state: FSMContext):
     """Обработка /start и /help."""
     try:
-        user_id = message.from_user.id
-        user_name = message.from_user.first_name
-        birth_date = get_user(user_id)
+        user = message.from_user
+        user_id = user.id
+        user_name = user.first_name
+        birth_date = await get_user(user_id)
 
         if birth_date:
             b_date = validate_date(birth_date)
@@ -299,7 +596,7 @@ async def start_handler(message: types.Message, state: FSMContext):
             weeksLived = (datetime.date.today() - b_date).days // 7
             targetWeeks = TARGET_YEARS_DISPLAY * WEEKS_IN_YEAR
             progress = weeksLived / targetWeeks
-            random_line = random.choice(BotTexts.RANDOM_ENDING_PHRASES)
+            random_line = _rng.choice(BotTexts.RANDOM_ENDING_PHRASES)
 
             await message.answer(BotTexts.WELCOME_RETURN.format(
                 name=user_name,
@@ -325,14 +622,15 @@ async def process_birth_date(message: types.Message, state: FSMContext):
     try:
         user_input = message.text.strip()
         birth_date = validate_date(user_input)
-        user_name = message.from_user.first_name
+        user = message.from_user
+        user_name = user.first_name
 
         if not birth_date:
-            response = random.choice(BotTexts.INVALID_DATE_RESPONSES)
+            response = _rng.choice(BotTexts.INVALID_DATE_RESPONSES)
             await message.answer(response)
             return
 
-        save_user(message.from_user.id, user_input)
+        await save_user(user.id, user_input)
         await message.answer(
             f"✅ Дата рождения успешно сохранена, {user_name}!\n\n"
             "Теперь ты можешь:\n"
@@ -348,13 +646,14 @@ async def process_birth_date(message: types.Message, state: FSMContext):
         await message.answer(BotTexts.INTERNAL_ERROR)
 
 
-@dp.message(lambda msg: msg.text == BotTexts.BUTTONS['years'])
+@dp.message(F.text == BotTexts.BUTTONS['years'])
 async def handle_years(message: types.Message):
     """Сколько недель прожито."""
     try:
-        user_id = message.from_user.id
-        user_name = message.from_user.first_name
-        birth_date_str = get_user(user_id)
+        user = message.from_user
+        user_id = user.id
+        user_name = user.first_name
+        birth_date_str = await get_user(user_id)
         if not birth_date_str:
             await message.answer(
                 f"ℹ️ {user_name}, укажи дату рождения через /start")
@@ -368,7 +667,7 @@ async def handle_years(message: types.Message):
         weeksLived = (datetime.date.today() - birth_date).days // 7
         targetWeeks = TARGET_YEARS_DISPLAY * WEEKS_IN_YEAR
         weeksRemaining = max(0, targetWeeks - weeksLived)
-        random_line = random.choice(BotTexts.RANDOM_ENDING_PHRASES)
+        random_line = _rng.choice(BotTexts.RANDOM_ENDING_PHRASES)
 
         await message.answer(
             f"🕰 <b>{user_name}</b>, прожито недель: <b>{weeksLived}</b>\n"
@@ -380,13 +679,14 @@ async def handle_years(message: types.Message):
         await message.answer(BotTexts.INTERNAL_ERROR)
 
 
-@dp.message(lambda msg: msg.text == BotTexts.BUTTONS['hours'])
+@dp.message(F.text == BotTexts.BUTTONS['hours'])
 async def handle_hours(message: types.Message):
     """Сколько часов прожито."""
     try:
-        user_id = message.from_user.id
-        user_name = message.from_user.first_name
-        birth_date_str = get_user(user_id)
+        user = message.from_user
+        user_id = user.id
+        user_name = user.first_name
+        birth_date_str = await get_user(user_id)
         if not birth_date_str:
             await message.answer(
                 f"ℹ️ {user_name}, укажи дату рождения через /start")
@@ -399,7 +699,7 @@ async def handle_hours(message: types.Message):
 
         lived_days = (datetime.date.today() - birth_date).days
         lived_hours = lived_days * 24
-        random_line = random.choice(BotTexts.RANDOM_ENDING_PHRASES)
+        random_line = _rng.choice(BotTexts.RANDOM_ENDING_PHRASES)
 
         await message.answer(
             f"⏳ <b>{user_name}</b>, прожито часов: <b>{lived_hours:,}</b>\n"
@@ -411,13 +711,14 @@ async def handle_hours(message: types.Message):
         await message.answer(BotTexts.INTERNAL_ERROR)
 
 
-@dp.message(lambda msg: msg.text == BotTexts.BUTTONS['progress'])
+@dp.message(F.text == BotTexts.BUTTONS['progress'])
 async def handle_progress(message: types.Message):
     """Прогресс жизни + фаза Луны."""
     try:
-        user_id = message.from_user.id
-        user_name = message.from_user.first_name
-        birth_date_str = get_user(user_id)
+        user = message.from_user
+        user_id = user.id
+        user_name = user.first_name
+        birth_date_str = await get_user(user_id)
         if not birth_date_str:
             await message.answer(
                 f"ℹ️ {user_name}, укажи дату рождения через /start")
@@ -431,7 +732,7 @@ async def handle_progress(message: types.Message):
         weeksLived = (datetime.date.today() - birth_date).days // 7
         targetWeeks = TARGET_YEARS_DISPLAY * WEEKS_IN_YEAR
         progress = weeksLived / targetWeeks
-        random_line = random.choice(BotTexts.RANDOM_ENDING_PHRASES)
+        random_line = _rng.choice(BotTexts.RANDOM_ENDING_PHRASES)
         bar = create_progress_bar(progress)
         moon_phase = get_moon_phase()  # фаза Луны
 
@@ -447,25 +748,13 @@ async def handle_progress(message: types.Message):
         await message.answer(BotTexts.INTERNAL_ERROR)
 
 
-@dp.message(lambda msg: msg.text == BotTexts.BUTTONS['motivation'])
+@dp.message(F.text == BotTexts.BUTTONS['motivation'])
 async def handle_motivation(message: types.Message):
     """Мотивация."""
     try:
         user_name = message.from_user.first_name
-        motivations = [
-            "🌱 Каждый день — новый шанс изменить свою историю",
-            "⏳ Время не ждет, но ты можешь им управлять",
-            "💡 Сегодняшние усилия — завтрашние достижения",
-            "🚀 Маленькие шаги приводят к большим целям",
-            "🌌 Твоя жизнь — самый ценный проект",
-            "🔑 Ключ к будущему — в настоящих поступках",
-            "🔥 Не бойся идти вперёд, даже если шаги малы",
-            "✨ Великие дела начинаются с маленькой идеи",
-            "🌿 Расти, как растёт дерево: медленно, но уверенно",
-            "💎 Каждый прожитый день — бесценный опыт"
-        ]
-        random_motivation = random.choice(motivations)
-        random_line = random.choice(BotTexts.RANDOM_ENDING_PHRASES)
+        random_motivation = _rng.choice(BotTexts.MOTIVATIONS)
+        random_line = _rng.choice(BotTexts.RANDOM_ENDING_PHRASES)
 
         await message.answer(
             f"💬 <b>{user_name}</b>, держи мудрость:\n\n"
@@ -476,7 +765,7 @@ async def handle_motivation(message: types.Message):
         await message.answer(BotTexts.INTERNAL_ERROR)
 
 
-@dp.message(lambda msg: msg.text == BotTexts.BUTTONS['change_date'])
+@dp.message(F.text == BotTexts.BUTTONS['change_date'])
 async def handle_change_date(message: types.Message, state: FSMContext):
     """Смена даты рождения."""
     try:
@@ -496,14 +785,15 @@ async def process_new_birth_date(message: types.Message, state: FSMContext):
     try:
         user_input = message.text.strip()
         birth_date = validate_date(user_input)
-        user_name = message.from_user.first_name
+        user = message.from_user
+        user_name = user.first_name
 
         if not birth_date:
-            response = random.choice(BotTexts.INVALID_DATE_RESPONSES)
+            response = _rng.choice(BotTexts.INVALID_DATE_RESPONSES)
             await message.answer(response)
             return
 
-        save_user(message.from_user.id, user_input)
+        await save_user(user.id, user_input)
         await message.answer(f"✅ Дата успешно обновлена, {user_name}!",
                              reply_markup=main_keyboard)
         await state.clear()
@@ -516,20 +806,14 @@ async def process_new_birth_date(message: types.Message, state: FSMContext):
 @dp.message()
 async def fallback_handler(message: types.Message):
     """Логируем и отвечаем, если сообщение не подходит под остальные хендлеры."""
-    user_id = message.from_user.id
-    user_name = message.from_user.first_name
+    user = message.from_user
+    user_id = user.id
+    user_name = user.first_name
 
     # Логируем сообщение
     log_user_message(user_id, message.text)
 
-    # Пример саркастических фраз:
-    fallback_phrases = [
-        f"Ты тратишь время, {user_name}, ведь я всего лишь бот — а жизнь твоя конечна.",
-        f"{user_name}, неужели писать боту — лучшее, что ты можешь сделать?",
-        f"Каждая секунда уходит безвозвратно, {user_name}, а ты здесь со мной...",
-        f"Время идёт, {user_name}, и пока мы тут болтаем, никто не становится моложе."
-    ]
-    phrase = random.choice(fallback_phrases)
+    phrase = _rng.choice(BotTexts.FALLBACK_PHRASES).format(name=user_name)
 
     await message.answer(phrase)
 
@@ -543,27 +827,24 @@ async def admin_stats_handler(message: types.Message):
         return
 
     try:
-        # Количество пользователей
-        users = get_all_users()
-        total_users = len(users)
-
-        # Считаем общее количество сообщений
-        with sqlite3.connect("users.db") as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) FROM messages")
-            total_messages = cursor.fetchone()[0] or 0
-
-        # Топ-5 пользователей по количеству сообщений
-        with sqlite3.connect("users.db") as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
+        async with reader_pool.acquire() as db, db.cursor() as cursor:
+            # Количество пользователей
+            await cursor.execute("SELECT COUNT(*) FROM users")
+            total_users = (await cursor.fetchone())[0] or 0
+
+            # Считаем общее количество сообщений
+            await cursor.execute("SELECT COUNT(*) FROM messages")
+            total_messages = (await cursor.fetchone())[0] or 0
+
+            # Топ-5 пользователей по количеству сообщений
+            await cursor.execute("""
                 SELECT user_id, COUNT(*) as msg_count 
                 FROM messages 
                 GROUP BY user_id 
                 ORDER BY msg_count DESC 
                 LIMIT 5
                 """)
-            top_users = cursor.fetchall()
+            top_users = await cursor.fetchall()
 
         result_text = (f"📊 <b>Статистика бота:</b>\n\n"
                        f"👥 Всего пользователей: <b>{total_users}</b>\n"
@@ -585,8 +866,12 @@ async def admin_stats_handler(message: types.Message):
 
 # ================== Планировщик (запуск) ==================
 async def on_startup(app):
-    """Запускается при старте aiohttp-приложения (установка webhook, планировщик)."""
+    """Запускается при старте aiohttp-приложения (БД, установка webhook, планировщик)."""
+    global log_flusher_task
+    # Без БД боту работать нечем: ошибка здесь останавливает запуск приложения
+    await create_database()
     try:
+        log_flusher_task = asyncio.create_task(flush_messages_task())
         await bot.set_webhook(url=WEBHOOK_URL,
                               drop_pending_updates=True,
                               allowed_updates=dp.resolve_used_update_types())
@@ -607,6 +892,15 @@ async def on_startup(app):
         logger.critical(f"Ошибка при запуске: {e}")
 
 
+async def on_shutdown(app):
+    """Дописывает очередь сообщений и закрывает БД при остановке aiohttp-приложения."""
+    for worker in broadcast_workers:
+        worker.cancel()
+    await asyncio.gather(*broadcast_workers, return_exceptions=True)
+    await stop_log_flusher()
+    await close_database()
+
+
 async def handle_root(request_: web.Request,
                       webhook_handler: SimpleRequestHandler):
     """HEAD → 200 (UptimeRobot), GET → 'Хроносфера активна', POST → webhook."""
@@ -619,8 +913,6 @@ async def handle_root(request_: web.Request,
 
 
 def main():
-    create_database()
-
     app = web.Application()
     webhook_handler = SimpleRequestHandler(dp, bot)
 
@@ -630,6 +922,7 @@ def main():
     app.router.add_route('*', '/', root_route)
     setup_application(app, dp, bot=bot)
     app.on_startup.append(on_startup)
+    app.on_shutdown.append(on_shutdown)
 
     try:
         web.run_app(app, host="0.0.0.0", port=int(os.getenv("PORT", "8080")))
@@ -3,9 +3,20 @@ from datetime import datetime
 
 DB_NAME = "users.db"
 
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-20000",
+)
+
 
 def create_database():
     conn = sqlite3.connect(DB_NAME)
+    if not DB_NAME.endswith(':memory:'):
+        for pragma in SQLITE_PRAGMAS:
+            conn.execute(pragma)
     c = conn.cursor()
     c.execute('''CREATE TABLE IF NOT EXISTS users (
         user_id INTEGER PRIMARY KEY,
@@ -32,7 +43,8 @@ def save_user(user_id: int, birth_date: str):
     except ValueError:
         raise ValueError("Неверный формат даты")
     c.execute(
-        '''INSERT OR REPLACE INTO users (user_id, birth_date) VALUES (?, ?)''',
+        '''INSERT INTO users (user_id, birth_date) VALUES (?, ?)
+        ON CONFLICT(user_id) DO UPDATE SET birth_date = excluded.birth_date''',
         (user_id, birth_date))
     conn.commit()
     conn.close()